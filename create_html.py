@@ -4,94 +4,193 @@ Create a single HTML file from the Skoda manual with proper header hierarchy
 and embedded images. Preserves original HTML structure.
 """
 
+import contextlib
+import functools
 import json
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib parser
+    orjson = None
+
+try:
+    import re2
+except ImportError:  # optional, falls back to the stdlib regex engine
+    re2 = None
+
 OUTPUT_DIR = Path("manual_output")
+OUTPUT_DIR_STR = str(OUTPUT_DIR)  # for plain os.path joins in per-topic/per-image code
 IMAGES_DIR = OUTPUT_DIR / "images"
 HTML_FILE = OUTPUT_DIR / "manual.html"
 
+# Tag-scanning patterns with several [^>]* runs backtrack badly on long tags
+# under the stdlib engine; use RE2 (linear time) for them when it's installed.
+# RE2 has no lookarounds, so patterns that need one stay on re.compile.
+_compile_linear = re2.compile if re2 is not None else re.compile
+
+# Precompiled patterns (these run once per topic and once per image)
+_PAT_OUTER_OPEN = re.compile(r'^<html[^>]*><div[^>]*><div class="topic-content">')
+_PAT_OUTER_CLOSE = re.compile(r'</div></div></html>$')
+_PAT_SIGNALWORD = _compile_linear(r'<div[^>]*data-role="signalword-panel"[^>]*>')
+_PAT_TITEL_BRIDGEHEAD = _compile_linear(r'<p[^>]*data-type="titel"[^>]*data-role="bridgehead"[^>]*>([^<]*)</p>')
+_PAT_BRIDGEHEAD_TITEL = _compile_linear(r'<p[^>]*data-role="bridgehead"[^>]*data-type="titel"[^>]*>([^<]*)</p>')
+# Empty paragraphs plus every attribute we drop, removed in a single pass
+_PAT_CLEAN = re.compile(
+    r'<p[^>]*>\s*</p>'
+    r'|\s+data-[a-z-]+="[^"]*"'
+    r'|\s+id="[^"]*"'
+    r'|\s+class="(?!signalword-panel|sub-header)[^"]*"'
+    r'|\s+media-link=""'
+    r'|\s+checked-link="[^"]*"'
+    r'|\s+alt=""'
+)
+_PAT_BOLD_P = re.compile(r'<p><strong>([^<]+)</strong></p>')
+# Link text up to the first </a>, nested tags included, without the
+# backtracking of a lazy DOTALL .*?
+_PAT_EMPTY_A = re.compile(r'<a[^>]*href="#"[^>]*>([^<]*(?:<(?!/a>)[^<]*)*)</a>')
+_PAT_IMG = _compile_linear(r'<img[^>]+>')
+# data-src (the real image) wins over src (often a placeholder) wherever it sits
+# in the tag, so the data-src branch must scan the whole tag before falling back
+_PAT_SRC = re.compile(r'(?:.*?data-src="([^"]+)"|.*?src="([^"]+)")', re.DOTALL)
+_PAT_KEY = re.compile(r'key=([^&]+)')
+_PAT_UNSAFE_FILENAME = re.compile(r'[^\w.-]')
+_PAT_NONWORD = re.compile(r'[^\w\s/-]')
+_PAT_SEP = re.compile(r'[\s/]+')
+
+# Inline <img> sizing per image kind (see url_to_local_path); explicit
+# dimensions let the browser reserve space for lazily loaded images
+_STYLE_BY_KIND = {
+    'qr': 'width: 150px; height: 150px;',
+    'svg': 'width: 24px; height: 24px; vertical-align: middle; display: inline;',
+    'other': 'max-width: 100%; height: auto;',
+}
+_SIZE_BY_KIND = {
+    'qr': ' width="150" height="150"',
+    'svg': ' width="24" height="24"',
+    'other': '',
+}
+
+
+@contextlib.contextmanager
+def _open_atomic(path, **kwargs):
+    """Open a temporary file for writing that replaces path only on success
+
+    A failed or interrupted write leaves the existing file untouched.
+    """
+    tmp_path = path.with_suffix('.tmp')
+    try:
+        with open(tmp_path, 'w', **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def load_json(path):
+    """Load a JSON file, using orjson when it is available"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
+
+@functools.lru_cache(maxsize=None)
 def check_image_exists(img_path):
-    """Check if local image exists"""
+    """Check if local image exists (cached, icons repeat across topics)"""
     try:
         if img_path.startswith("images/"):
-            full_path = OUTPUT_DIR / img_path
+            full_path = os.path.join(OUTPUT_DIR_STR, img_path)
         else:
-            full_path = Path(img_path)
-        return full_path.exists()
+            full_path = img_path
+        return os.path.exists(full_path)
     except:
         return False
 
 
+@functools.lru_cache(maxsize=None)
 def url_to_local_path(url):
-    """Convert remote URL to local image path"""
+    """Convert remote URL to a (local image path, image kind) tuple
+
+    The path is None when the URL has no key parameter. The kind is 'qr',
+    'svg' or 'other' and decides how the image is sized.
+    """
     # Decode HTML entities
     url = url.replace('&amp;', '&')
+    url_lower = url.lower()
+
+    if 'imgqr' in url_lower:
+        kind = 'qr'
+    elif '.svg' in url_lower:
+        kind = 'svg'
+    else:
+        kind = 'other'
 
     if 'key=' in url:
         # Extract key parameter
-        match = re.search(r'key=([^&]+)', url)
+        match = _PAT_KEY.search(url)
         if match:
             key = match.group(1)
-            filename = re.sub(r'[^\w.-]', '_', key)
-            if '.svg' in key.lower() or '.svg' in url.lower():
+            filename = _PAT_UNSAFE_FILENAME.sub('_', key)
+            if '.svg' in url_lower:
                 if not filename.endswith('.svg'):
                     filename += '.svg'
             elif not any(filename.endswith(ext) for ext in ['.png', '.jpg', '.gif', '.svg']):
                 filename += '.png'
-            return f"images/{filename}"
-    return None
+            return f"images/{filename}", kind
+    return None, kind
+
+
+@functools.lru_cache(maxsize=None)
+def make_anchor(path):
+    """Create unique anchor from full path"""
+    anchor = path.lower()
+    anchor = _PAT_NONWORD.sub('', anchor)
+    anchor = _PAT_SEP.sub('-', anchor)
+    return anchor
 
 
 def process_source_html(html_content):
     """Process the source HTML to clean it up and make it display properly"""
 
+    # Plain substring checks are much cheaper than a regex scan, so only run
+    # the structural rewrites on bodies that can actually contain a match
+
     # Remove outer html/div wrappers
-    html = re.sub(r'^<html[^>]*><div[^>]*><div class="topic-content">', '', html_content)
-    html = re.sub(r'</div></div></html>$', '', html)
+    html = _PAT_OUTER_OPEN.sub('', html_content)
+    # $ also matches before a trailing newline, so this is not a plain
+    # removesuffix; the slice check just skips the scan when there's no wrapper
+    if '</div></div></html>' in html[-21:]:
+        html = _PAT_OUTER_CLOSE.sub('', html)
 
     # Remove non-standard </img> closing tags
     html = html.replace('</img>', '')
 
     # Convert warning/caution panels to proper structure
     # Pattern: <div data-role="signalword-panel"><img...><p>WAARSCHUWING</p></div>
-    html = re.sub(
-        r'<div[^>]*data-role="signalword-panel"[^>]*>',
-        r'<div class="signalword-panel">',
-        html
-    )
+    if 'signalword-panel' in html:
+        html = _PAT_SIGNALWORD.sub(r'<div class="signalword-panel">', html)
 
     # Convert data-type="titel" paragraphs to bold headers
-    html = re.sub(
-        r'<p[^>]*data-type="titel"[^>]*data-role="bridgehead"[^>]*>([^<]*)</p>',
-        r'<p class="sub-header"><strong>\1</strong></p>',
-        html
-    )
-    html = re.sub(
-        r'<p[^>]*data-role="bridgehead"[^>]*data-type="titel"[^>]*>([^<]*)</p>',
-        r'<p class="sub-header"><strong>\1</strong></p>',
-        html
-    )
-
-    # Clean up empty paragraphs
-    html = re.sub(r'<p[^>]*>\s*</p>', '', html)
-
-    # Remove unnecessary data attributes but keep structure
-    html = re.sub(r'\s+data-[a-z-]+="[^"]*"', '', html)
-    html = re.sub(r'\s+id="[^"]*"', '', html)
-    html = re.sub(r'\s+class="(?!signalword-panel|sub-header)[^"]*"', '', html)
-    html = re.sub(r'\s+media-link=""', '', html)
-    html = re.sub(r'\s+checked-link="[^"]*"', '', html)
-    html = re.sub(r'\s+alt=""', '', html)
+    if 'bridgehead' in html:
+        html = _PAT_TITEL_BRIDGEHEAD.sub(r'<p class="sub-header"><strong>\1</strong></p>', html)
+        html = _PAT_BRIDGEHEAD_TITEL.sub(r'<p class="sub-header"><strong>\1</strong></p>', html)
+
+    # Clean up empty paragraphs and remove unnecessary attributes but keep structure
+    html = _PAT_CLEAN.sub('', html)
 
     # Re-add important classes
-    html = re.sub(r'<p><strong>([^<]+)</strong></p>', r'<p class="sub-header"><strong>\1</strong></p>', html)
+    if '<p><strong>' in html:
+        html = _PAT_BOLD_P.sub(r'<p class="sub-header"><strong>\1</strong></p>', html)
 
     # Remove empty/broken links but keep their text content
-    html = re.sub(r'<a[^>]*href="#"[^>]*>([^<]*)</a>', r'\1', html)
-    html = re.sub(r'<a[^>]*href="#"[^>]*>(.*?)</a>', r'\1', html, flags=re.DOTALL)
+    if 'href="#"' in html:
+        html = _PAT_EMPTY_A.sub(r'\1', html)
 
     return html
 
@@ -101,33 +200,44 @@ def embed_images_in_html(html_content):
 
     def replace_img(match):
         full_tag = match.group(0)
-        src_match = re.search(r'data-src="([^"]+)"', full_tag) or re.search(r'src="([^"]+)"', full_tag)
+        src_match = _PAT_SRC.match(full_tag)
 
         if not src_match:
             return full_tag
 
-        src = src_match.group(1).replace('&amp;', '&')
+        src = src_match.group(src_match.lastindex).replace('&amp;', '&')
 
-        # Determine sizing based on image type
-        is_svg = '.svg' in src.lower()
-        is_qr = 'imgqr' in src.lower()
+        # Try to get local path; the kind determines sizing
+        local_path, kind = url_to_local_path(src)
+        size = _SIZE_BY_KIND[kind]
+        style = _STYLE_BY_KIND[kind]
 
-        if is_qr:
-            style = 'width: 150px; height: 150px;'
-        elif is_svg:
-            style = 'width: 24px; height: 24px; vertical-align: middle; display: inline;'
-        else:
-            style = 'max-width: 100%; height: auto;'
-
-        # Try to get local path
-        local_path = url_to_local_path(src)
         if local_path and check_image_exists(local_path):
-            return f'<img src="{local_path}" style="{style}">'
+            return f'<img src="{local_path}"{size} loading="lazy" decoding="async" style="{style}">'
 
         # Fallback to original URL
-        return f'<img src="{src}" style="{style}">'
+        return f'<img src="{src}"{size} loading="lazy" decoding="async" style="{style}">'
+
+    return _PAT_IMG.sub(replace_img, html_content)
+
+
+def _process_topic(topic):
+    """Load a topic's raw.json and return its cleaned HTML, or None if missing
+
+    Runs in a worker process, so it must stay a module-level function.
+    """
+    json_file = os.path.join(OUTPUT_DIR_STR, topic['path'], "raw.json")
+    if not os.path.exists(json_file):
+        return None
+
+    data = load_json(json_file)
+
+    body_html = data.get('bodyHtml', '')
 
-    return re.sub(r'<img[^>]+>', replace_img, html_content)
+    # FIRST embed images (before we strip data-src attributes)
+    processed_html = embed_images_in_html(body_html)
+    # THEN clean up the HTML structure
+    return process_source_html(processed_html)
 
 
 def create_html():
@@ -135,12 +245,27 @@ def create_html():
     print("Creating HTML file...")
 
     index_file = OUTPUT_DIR / "index.json"
-    with open(index_file, 'r', encoding='utf-8') as f:
-        topics = json.load(f)
+    topics = load_json(index_file)
 
     print(f"Processing {len(topics)} topics...")
 
-    html_parts = ['''<!DOCTYPE html>
+    # Shared by the TOC and the body loop
+    depths = [topic['path'].count('/') for topic in topics]
+    anchors = [make_anchor(topic['path']) for topic in topics]
+
+    # Topics with body content; categories and the index topic are emitted inline
+    content_topics = [
+        topic for topic in topics
+        if not (topic.get('is_category', False) or topic.get('id') is None)
+        and topic['path'] != 'Handleiding'
+    ]
+
+    with ProcessPoolExecutor() as executor, \
+            _open_atomic(HTML_FILE, encoding='utf-8', buffering=1 << 20) as out:
+        # Results come back in submission order, so sections stay in topic order
+        processed = executor.map(_process_topic, content_topics, chunksize=16)
+
+        out.write('''<!DOCTYPE html>
 <html lang="nl">
 <head>
     <meta charset="UTF-8">
@@ -379,95 +504,67 @@ def create_html():
     </style>
 </head>
 <body>
-''']
-
-    def make_anchor(path):
-        """Create unique anchor from full path"""
-        anchor = path.lower()
-        anchor = re.sub(r'[^\w\s/-]', '', anchor)
-        anchor = re.sub(r'[\s/]+', '-', anchor)
-        return anchor
-
-    # Build TOC
-    html_parts.append('    <nav class="toc">\n        <h2>Inhoudsopgave</h2>\n')
-    prev_depth = -1
-    for topic in topics:
-        depth = topic['path'].count('/')
-        label = topic['label']
-        anchor = make_anchor(topic['path'])
-        is_category = topic.get('is_category', False) or topic.get('id') is None
-
-        if depth > prev_depth:
-            for _ in range(depth - prev_depth):
-                html_parts.append('<ol>\n')
-        elif depth < prev_depth:
-            for _ in range(prev_depth - depth):
-                html_parts.append('</li>\n</ol>\n')
-            if prev_depth >= 0:
-                html_parts.append('</li>\n')
-        else:
-            if prev_depth >= 0:
-                html_parts.append('</li>\n')
-
-        if is_category:
-            html_parts.append(f'<li><strong>{label}</strong>\n')
-        else:
-            html_parts.append(f'<li><a href="#{anchor}">{label}</a>\n')
-        prev_depth = depth
-
-    for _ in range(prev_depth + 1):
-        html_parts.append('</li>\n</ol>\n')
-    html_parts.append('    </nav>\n\n')
-
-    # Start main content wrapper
-    html_parts.append('    <div class="main-content">\n')
-    html_parts.append('    <h1>Škoda Enyaq Handleiding</h1>\n')
-
-    # Add content for each topic
-    for i, topic in enumerate(topics):
-        depth = topic['path'].count('/')
-        label = topic['label']
-        anchor = make_anchor(topic['path'])
-        is_category = topic.get('is_category', False) or topic.get('id') is None
-
-        header_level = min(depth + 1, 6)
-
-        if is_category:
-            html_parts.append(f'    <h{header_level} class="category-header">{label}</h{header_level}>\n\n')
-            continue
-
-        # Skip the main "Handleiding" topic as it's just the index
-        if topic['path'] == 'Handleiding':
-            continue
-
-        # Read raw JSON content
-        topic_dir = OUTPUT_DIR / topic['path']
-        json_file = topic_dir / "raw.json"
-
-        if json_file.exists():
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            body_html = data.get('bodyHtml', '')
-
-            # FIRST embed images (before we strip data-src attributes)
-            processed_html = embed_images_in_html(body_html)
-            # THEN clean up the HTML structure
-            processed_html = process_source_html(processed_html)
-
-            html_parts.append(f'    <div class="topic-section" id="{anchor}">\n')
-            html_parts.append(f'        <h{header_level}>{label}</h{header_level}>\n')
-            html_parts.append(f'        {processed_html}\n')
-            html_parts.append('    </div>\n\n')
-
-        if (i + 1) % 50 == 0:
-            print(f"  Processed {i + 1}/{len(topics)} topics...")
-
-    html_parts.append('    </div>\n')  # Close main-content
-    html_parts.append('</body>\n</html>')
-
-    html_content = ''.join(html_parts)
-    HTML_FILE.write_text(html_content, encoding='utf-8')
+''')
+
+        # Build TOC in memory and write it in one go
+        toc_parts = ['    <nav class="toc">\n        <h2>Inhoudsopgave</h2>\n']
+        prev_depth = -1
+        for topic, depth, anchor in zip(topics, depths, anchors):
+            label = topic['label']
+            is_category = topic.get('is_category', False) or topic.get('id') is None
+
+            if depth > prev_depth:
+                toc_parts.append('<ol>\n' * (depth - prev_depth))
+            elif depth < prev_depth:
+                toc_parts.append('</li>\n</ol>\n' * (prev_depth - depth))
+                if prev_depth >= 0:
+                    toc_parts.append('</li>\n')
+            else:
+                if prev_depth >= 0:
+                    toc_parts.append('</li>\n')
+
+            if is_category:
+                toc_parts.append(f'<li><strong>{label}</strong>\n')
+            else:
+                toc_parts.append(f'<li><a href="#{anchor}">{label}</a>\n')
+            prev_depth = depth
+
+        toc_parts.append('</li>\n</ol>\n' * (prev_depth + 1))
+        toc_parts.append('    </nav>\n\n')
+        out.write(''.join(toc_parts))
+
+        # Start main content wrapper
+        out.write('    <div class="main-content">\n')
+        out.write('    <h1>Škoda Enyaq Handleiding</h1>\n')
+
+        # Add content for each topic
+        for i, (topic, depth, anchor) in enumerate(zip(topics, depths, anchors)):
+            label = topic['label']
+            is_category = topic.get('is_category', False) or topic.get('id') is None
+
+            header_level = min(depth + 1, 6)
+
+            if is_category:
+                out.write(f'    <h{header_level} class="category-header">{label}</h{header_level}>\n\n')
+                continue
+
+            # Skip the main "Handleiding" topic as it's just the index
+            if topic['path'] == 'Handleiding':
+                continue
+
+            processed_html = next(processed)
+            if processed_html is not None:
+                out.write(f'    <div class="topic-section" id="{anchor}">\n')
+                out.write(f'        <h{header_level}>{label}</h{header_level}>\n')
+                out.write('        ')
+                out.write(processed_html)
+                out.write('\n    </div>\n\n')
+
+            if (i + 1) % 50 == 0:
+                print(f"  Processed {i + 1}/{len(topics)} topics...")
+
+        out.write('    </div>\n')  # Close main-content
+        out.write('</body>\n</html>')
 
     size_mb = HTML_FILE.stat().st_size / (1024 * 1024)
     print(f"\nCreated: {HTML_FILE}")
@@ -5,15 +5,29 @@ Downloads all topics from the digital manual and converts to markdown.
 Also downloads all images locally.
 """
 
+import io
 import json
 import os
 import re
+import shutil
+import ssl
 import time
 import hashlib
-import urllib.request
+import email.utils
+import random
+import http.client
+import threading
+import urllib.error
 import urllib.parse
 from pathlib import Path
 from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib json module
+    orjson = None
 
 # Configuration
 BASE_URL = "https://digital-manual.skoda-auto.com"
@@ -22,13 +36,98 @@ LANGUAGE = "nl_NL"
 OUTPUT_DIR = Path("manual_output")
 IMAGES_DIR = OUTPUT_DIR / "images"
 COOKIES_FILE = Path("cookies.txt")
-
-# Rate limiting
-DELAY_BETWEEN_REQUESTS = 0.3  # seconds
-IMAGE_DELAY = 0.1  # faster for images
+MANIFEST_FILE = IMAGES_DIR / "manifest.json"  # url -> local path, kept across runs
+ETAGS_FILE = OUTPUT_DIR / "etags.json"  # topic id -> ETag of the saved content
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+
+# Known image extensions, normalized
+# Checked in order, so .svg wins over .png etc.
+IMAGE_EXTENSIONS = {'.svg': '.svg', '.png': '.png', '.jpg': '.jpg', '.jpeg': '.jpg', '.gif': '.gif'}
+
+# Precompiled patterns
+_RE_TAGS = re.compile(r'<[^>]+>')
+_RE_WS = re.compile(r'\s+')
+_RE_NL3 = re.compile(r'\n{3,}')
+_RE_NONWORD = re.compile(r'[^\w\s-]')
+_RE_UNSAFE_FILENAME = re.compile(r'[^\w.-]')
+_RE_REL_IMAGES = re.compile(r'\.\./+images/')
+_RE_IMAGE_PLACEHOLDER = re.compile(r'\{IMAGE:(\d+)\}')
+
+# Concurrency and rate limiting
+MAX_WORKERS = 8  # topics downloaded in parallel
+MAX_REQUESTS_PER_SECOND = 10  # shared by all workers, topics and images alike
+MAX_IMAGE_WORKERS = 8  # images downloaded in parallel, across all topics
+MANIFEST_SAVE_EVERY = 25  # topics between image manifest saves
+
+# Retries for overloaded/throttled responses; Retry-After wins when present
+RETRY_STATUSES = {429, 502, 503, 504}
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5  # seconds, doubled per attempt
+MAX_RETRY_DELAY = 60  # seconds
 
 # Global image cache to avoid re-downloading
 downloaded_images = {}
+_image_locks = {}  # filename -> Lock, so each image file is written by one worker only
+_image_locks_guard = threading.Lock()
+
+# ETags of saved topics, so unchanged ones are skipped on the next run
+topic_etags = {}
+
+# Keep-alive connections per (scheme, host), one set per worker thread; almost
+# every request goes to the same host, so this saves a TCP + TLS handshake per
+# topic and per image
+_local = threading.local()
+
+
+class RateLimiter:
+    """Space out request starts across threads without serializing requests"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Hold back every thread's next request, e.g. when the server says 429"""
+        with self.lock:
+            self.next_slot = max(self.next_slot, time.monotonic() + seconds)
+
+
+rate_limiter = RateLimiter(MAX_REQUESTS_PER_SECOND)
+
+# Shared by all topic workers; threads are only started once images are submitted.
+# Image tasks never wait on topic tasks, so topic workers can block on it safely.
+image_executor = ThreadPoolExecutor(max_workers=MAX_IMAGE_WORKERS, thread_name_prefix='image')
+
+
+# Tags that always emit the same markdown; looked up before the tags that
+# need attributes or parser state
+_START_MARKUP = {
+    **{f'h{level}': '\n' + '#' * level + ' ' for level in range(1, 7)},
+    'p': '\n\n',
+    'section': '\n\n',
+    'br': '\n',
+    'strong': '**',
+    'b': '**',
+    'em': '*',
+    'i': '*',
+}
+_END_MARKUP = {
+    **{f'h{level}': '\n' for level in range(1, 7)},
+    'strong': '**',
+    'b': '**',
+    'em': '*',
+    'i': '*',
+    'li': '\n',
+}
 
 
 class HTMLToMarkdown(HTMLParser):
@@ -36,7 +135,8 @@ class HTMLToMarkdown(HTMLParser):
 
     def __init__(self, topic_path=""):
         super().__init__()
-        self.output = []
+        self.buf = io.StringIO()
+        self._newlines = 0  # consecutive newlines at the end of buf
         self.list_stack = []
         self.in_code = False
         self.current_link = None
@@ -44,102 +144,99 @@ class HTMLToMarkdown(HTMLParser):
         self.image_urls = []  # Collect image URLs
         self.topic_path = topic_path
 
+    def _emit(self, text):
+        """Append text, collapsing runs of 3+ newlines to 2 as they are written"""
+        body = text.lstrip('\n')
+        leading = min(len(text) - len(body), 2 - self._newlines)
+        if leading > 0:
+            self.buf.write('\n' * leading)
+            self._newlines += leading
+        if not body:
+            return
+        if '\n\n\n' in body:
+            body = _RE_NL3.sub('\n\n', body)
+        self.buf.write(body)
+        self._newlines = len(body) - len(body.rstrip('\n'))
+
     def handle_starttag(self, tag, attrs):
-        attrs_dict = dict(attrs)
+        markup = _START_MARKUP.get(tag)
+        if markup is not None:
+            self._emit(markup)
+            return
 
         if tag == 'script' or tag == 'style':
             self.skip_content = True
-            return
-
-        if tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-            level = int(tag[1])
-            self.output.append('\n' + '#' * level + ' ')
-        elif tag == 'p':
-            self.output.append('\n\n')
-        elif tag == 'br':
-            self.output.append('\n')
-        elif tag == 'strong' or tag == 'b':
-            self.output.append('**')
-        elif tag == 'em' or tag == 'i':
-            self.output.append('*')
         elif tag == 'a':
-            self.current_link = attrs_dict.get('href', '')
-            self.output.append('[')
+            self.current_link = dict(attrs).get('href', '')
+            self._emit('[')
         elif tag == 'ul':
             self.list_stack.append('ul')
-            self.output.append('\n')
+            self._emit('\n')
         elif tag == 'ol':
             self.list_stack.append(('ol', 0))
-            self.output.append('\n')
+            self._emit('\n')
         elif tag == 'li':
             if self.list_stack:
                 if self.list_stack[-1] == 'ul':
-                    self.output.append('- ')
+                    self._emit('- ')
                 else:
                     lst_type, num = self.list_stack[-1]
                     num += 1
                     self.list_stack[-1] = (lst_type, num)
-                    self.output.append(f'{num}. ')
+                    self._emit(f'{num}. ')
         elif tag == 'img':
+            attrs_dict = dict(attrs)
             src = attrs_dict.get('data-src') or attrs_dict.get('src', '')
             alt = attrs_dict.get('alt', 'image')
             if src:
+                # Placeholder (index into image_urls) - replaced after image download
+                self._emit(f'\n![{alt}]({{IMAGE:{len(self.image_urls)}}})\n')
                 self.image_urls.append(src)
-                # Placeholder - will be replaced after image download
-                self.output.append(f'\n![{alt}]({{IMAGE:{src}}})\n')
         elif tag == 'code' or tag == 'pre':
-            self.output.append('`')
+            self._emit('`')
             self.in_code = True
-        elif tag == 'section':
-            self.output.append('\n\n')
         elif tag == 'div':
-            data_type = attrs_dict.get('data-type', '')
-            if data_type in ['warning', 'note', 'caution']:
-                self.output.append(f'\n\n> **{data_type.upper()}**: ')
+            data_type = dict(attrs).get('data-type', '')
+            if data_type in ('warning', 'note', 'caution'):
+                self._emit(f'\n\n> **{data_type.upper()}**: ')
 
     def handle_endtag(self, tag):
-        if tag == 'script' or tag == 'style':
-            self.skip_content = False
+        markup = _END_MARKUP.get(tag)
+        if markup is not None:
+            self._emit(markup)
             return
 
-        if tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-            self.output.append('\n')
-        elif tag == 'strong' or tag == 'b':
-            self.output.append('**')
-        elif tag == 'em' or tag == 'i':
-            self.output.append('*')
+        if tag == 'script' or tag == 'style':
+            self.skip_content = False
         elif tag == 'a':
             if self.current_link:
-                self.output.append(f']({self.current_link})')
+                self._emit(f']({self.current_link})')
             else:
-                self.output.append('](#)')
+                self._emit('](#)')
             self.current_link = None
         elif tag == 'ul' or tag == 'ol':
             if self.list_stack:
                 self.list_stack.pop()
-            self.output.append('\n')
-        elif tag == 'li':
-            self.output.append('\n')
+            self._emit('\n')
         elif tag == 'code' or tag == 'pre':
-            self.output.append('`')
+            self._emit('`')
             self.in_code = False
 
     def handle_data(self, data):
         if self.skip_content:
             return
         if not self.in_code:
-            data = re.sub(r'\s+', ' ', data)
-        self.output.append(data)
+            data = _RE_WS.sub(' ', data)
+        self._emit(data)
 
     def get_markdown(self):
-        result = ''.join(self.output)
-        result = re.sub(r'\n{3,}', '\n\n', result)
-        return result.strip()
+        return self.buf.getvalue().strip()
 
     def get_image_urls(self):
         return self.image_urls
 
 
+@lru_cache(maxsize=8192)
 def url_to_filename(url):
     """Convert URL to a safe filename"""
     # Extract key parameter if present
@@ -149,22 +246,15 @@ def url_to_filename(url):
     if 'key' in params:
         key = params['key'][0]
         # Clean up the key to make a filename
-        filename = re.sub(r'[^\w.-]', '_', key)
+        filename = _RE_UNSAFE_FILENAME.sub('_', key)
     else:
         # Use hash of URL for other cases
-        filename = hashlib.md5(url.encode()).hexdigest()
-
-    # Determine extension
-    if '.svg' in url.lower():
-        ext = '.svg'
-    elif '.png' in url.lower():
-        ext = '.png'
-    elif '.jpg' in url.lower() or '.jpeg' in url.lower():
-        ext = '.jpg'
-    elif '.gif' in url.lower():
-        ext = '.gif'
-    else:
-        ext = '.png'  # default
+        filename = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+
+    # Determine extension from anywhere in the URL, defaulting to png;
+    # create_html.url_to_local_path relies on the same rule
+    url_lower = url.lower()
+    ext = next((ext for marker, ext in IMAGE_EXTENSIONS.items() if marker in url_lower), '.png')
 
     if not filename.endswith(ext):
         filename += ext
@@ -172,64 +262,128 @@ def url_to_filename(url):
     return filename
 
 
-def download_image(url, cookies_str):
-    """Download an image and return local path"""
-    global downloaded_images
+def _image_lock(filename):
+    """Return the lock guarding downloads into a single image file"""
+    # Keyed on the file, not the URL: URLs that differ only outside key=
+    # share a file and must not be written at the same time
+    with _image_locks_guard:
+        return _image_locks.setdefault(filename, threading.Lock())
 
-    if url in downloaded_images:
-        return downloaded_images[url]
 
-    try:
-        filename = url_to_filename(url)
-        local_path = IMAGES_DIR / filename
+def download_image(url, cookies_str):
+    """Download an image and return (local path, whether it was new)"""
+    filename = url_to_filename(url)
+    with _image_lock(filename):
+        if url in downloaded_images:
+            return downloaded_images[url], False
+
+        try:
+            local_path = IMAGES_DIR / filename
+
+            # Check if already downloaded
+            if local_path.exists():
+                rel_path = f"images/{filename}"
+                downloaded_images[url] = rel_path
+                return rel_path, True
+
+            # Stream to a temporary name so an interrupted download never
+            # leaves a truncated file that later runs would treat as complete;
+            # the per-file lock makes this worker its only writer
+            part_path = local_path.with_name(filename + '.part')
+            try:
+                with open(part_path, 'wb') as f:
+                    http_get(url, cookies_str, dest=f)
+                os.replace(part_path, local_path)
+            finally:
+                if part_path.exists():
+                    part_path.unlink()
 
-        # Check if already downloaded
-        if local_path.exists():
             rel_path = f"images/{filename}"
             downloaded_images[url] = rel_path
-            return rel_path
+            return rel_path, True
+
+        except Exception as e:
+            print(f"\n  Warning: Failed to download image {url[:50]}...: {e}")
+            downloaded_images[url] = url  # Fall back to original URL
+            return url, True
+
+
+def load_image_manifest():
+    """Seed downloaded_images from a previous run's manifest; returns entry count"""
+    if not MANIFEST_FILE.exists():
+        return 0
+    manifest = json.loads(MANIFEST_FILE.read_text(encoding='utf-8'))
+    for url, rel_path in manifest.items():
+        # Skip entries whose file has since been removed
+        if (OUTPUT_DIR / rel_path).exists():
+            downloaded_images[url] = rel_path
+    return len(downloaded_images)
 
-        # Download
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36')
-        req.add_header('Cookie', cookies_str)
 
-        with urllib.request.urlopen(req, timeout=30) as response:
-            content = response.read()
-            local_path.write_bytes(content)
+def save_image_manifest():
+    """Write successfully stored images to the manifest (atomically)"""
+    # dict.copy() is a single C call, so workers adding entries can't break it
+    manifest = {url: path for url, path in downloaded_images.copy().items() if path != url}
+    tmp_file = MANIFEST_FILE.with_suffix('.tmp')
+    tmp_file.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_file, MANIFEST_FILE)
 
-        rel_path = f"images/{filename}"
-        downloaded_images[url] = rel_path
-        time.sleep(IMAGE_DELAY)
-        return rel_path
 
-    except Exception as e:
-        print(f"\n  Warning: Failed to download image {url[:50]}...: {e}")
-        downloaded_images[url] = url  # Fall back to original URL
-        return url
+def load_etags():
+    """Seed topic_etags from a previous run; returns entry count"""
+    if ETAGS_FILE.exists():
+        topic_etags.update(json.loads(ETAGS_FILE.read_text(encoding='utf-8')))
+    return len(topic_etags)
+
 
+def save_etags():
+    """Write the ETags of saved topics (atomically)"""
+    tmp_file = ETAGS_FILE.with_suffix('.tmp')
+    tmp_file.write_text(json.dumps(topic_etags.copy(), indent=2, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_file, ETAGS_FILE)
 
-def html_to_markdown(html_content, cookies_str, topic_path=""):
-    """Convert HTML to Markdown and download images"""
+
+def topic_rel_prefix(topic_path):
+    """Relative path from a topic's directory back to OUTPUT_DIR"""
+    return '../' * (topic_path.count('/') + 1)
+
+
+def html_to_markdown(html_content, cookies_str, topic_path="", rel_prefix=None):
+    """Convert HTML to Markdown and download images
+
+    rel_prefix is the path from the topic's directory back to OUTPUT_DIR; it
+    is derived from topic_path when not given. Returns the markdown, the
+    number of images that were new to this run and whether the result is
+    complete: False if the HTML could not be parsed and was only stripped of
+    tags, or if any image could not be stored locally.
+    """
+    if rel_prefix is None:
+        rel_prefix = topic_rel_prefix(topic_path)
     parser = HTMLToMarkdown(topic_path)
+    new_images = 0
     try:
         parser.feed(html_content)
         markdown = parser.get_markdown()
         image_urls = parser.get_image_urls()
-
-        # Download images and replace placeholders
-        for img_url in image_urls:
-            local_path = download_image(img_url, cookies_str)
-            # Calculate relative path from topic to images
-            depth = topic_path.count('/')
-            rel_prefix = '../' * (depth + 1) if depth >= 0 else ''
-            rel_path = rel_prefix + local_path
-            markdown = markdown.replace(f'{{IMAGE:{img_url}}}', rel_path)
-
-        return markdown
     except Exception as e:
         print(f"Warning: HTML parsing error: {e}")
-        return re.sub(r'<[^>]+>', '', html_content)
+        return _RE_TAGS.sub('', html_content), new_images, False
+
+    # Download images concurrently, then replace all placeholders in a single
+    # pass. This stays outside the try: a failure here (e.g. the image pool
+    # shutting down) must fail the topic, not pass for unparseable HTML.
+    rel_paths = []
+    complete = True
+    results = image_executor.map(download_image, image_urls, [cookies_str] * len(image_urls))
+    for url, (local_path, is_new) in zip(image_urls, results):
+        new_images += is_new
+        if local_path == url:  # download_image falls back to the URL
+            complete = False
+        rel_paths.append(rel_prefix + local_path)
+    if rel_paths:
+        markdown = _RE_IMAGE_PLACEHOLDER.sub(lambda m: rel_paths[int(m.group(1))], markdown)
+
+    return markdown, new_images, complete
 
 
 def load_cookies():
@@ -239,15 +393,138 @@ def load_cookies():
     return COOKIES_FILE.read_text().strip()
 
 
+def _thread_connections():
+    """Return this thread's (scheme, host) -> connection dict"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    return connections
+
+
+@lru_cache(maxsize=None)
+def _ssl_context():
+    """One TLS context for all connections; building one loads the CA bundle"""
+    return ssl.create_default_context()
+
+
+def _get_connection(scheme, host):
+    """Return the cached keep-alive connection for a host, opening it if needed"""
+    connections = _thread_connections()
+    conn = connections.get((scheme, host))
+    if conn is None:
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, timeout=30, context=_ssl_context())
+        else:
+            conn = http.client.HTTPConnection(host, timeout=30)
+        connections[(scheme, host)] = conn
+    return conn
+
+
+def _drop_connection(scheme, host):
+    """Close and forget a connection, e.g. after the server dropped it"""
+    conn = _thread_connections().pop((scheme, host), None)
+    if conn is not None:
+        conn.close()
+
+
+def retry_delay(retry_after, attempt):
+    """Seconds to wait before a retry: Retry-After if usable, else backoff with jitter"""
+    if retry_after:
+        try:
+            return min(max(0.0, float(retry_after)), MAX_RETRY_DELAY)
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            return min(max(0.0, retry_at.timestamp() - time.time()), MAX_RETRY_DELAY)
+        except (TypeError, ValueError):
+            pass
+    return min(RETRY_BACKOFF * 2 ** attempt, MAX_RETRY_DELAY) * random.uniform(0.5, 1.5)
+
+
+def http_request(url, cookies_str, accept=None, dest=None, max_redirects=5, etag=None):
+    """GET a URL over a reused connection; returns (response, body)
+
+    If dest (a binary file object) is given, the body is streamed into it in
+    chunks instead of being held in memory, and body is None. If etag is given
+    the request is conditional and a 304 response is returned as-is.
+    """
+    headers = {'User-Agent': USER_AGENT, 'Cookie': cookies_str}
+    if accept:
+        headers['Accept'] = accept
+    if etag:
+        headers['If-None-Match'] = etag
+
+    redirects = retries = 0
+    while True:
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        # A kept-alive connection may have been closed by the server since the
+        # last request; retry once on a fresh one before giving up
+        for attempt in range(2):
+            conn = _get_connection(parts.scheme, parts.netloc)
+            rate_limiter.wait()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    ConnectionResetError, BrokenPipeError):
+                _drop_connection(parts.scheme, parts.netloc)
+                if attempt:
+                    raise
+            except Exception:
+                _drop_connection(parts.scheme, parts.netloc)
+                raise
+
+        # The body must be consumed in full before the connection is reused
+        try:
+            if dest is not None and response.status < 300:
+                shutil.copyfileobj(response, dest, 1 << 16)
+                body = None
+            else:
+                body = response.read()
+        except Exception:
+            _drop_connection(parts.scheme, parts.netloc)
+            raise
+
+        if response.will_close:
+            _drop_connection(parts.scheme, parts.netloc)
+
+        if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+            if redirects >= max_redirects:
+                raise urllib.error.HTTPError(url, response.status, 'Too many redirects', response.headers, None)
+            redirects += 1
+            url = urllib.parse.urljoin(url, response.getheader('Location'))
+            continue
+        if response.status in RETRY_STATUSES and retries < MAX_RETRIES:
+            # Back off only when the server asks for it; all workers share the pause
+            rate_limiter.pause(retry_delay(response.getheader('Retry-After'), retries))
+            retries += 1
+            continue
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+        return response, body
+
+
+def http_get(url, cookies_str, accept=None, dest=None, max_redirects=5):
+    """GET a URL and return the response body (None when streamed to dest)"""
+    return http_request(url, cookies_str, accept, dest, max_redirects)[1]
+
+
+def parse_json(body):
+    """Decode a JSON response body"""
+    if orjson is not None:
+        return orjson.loads(body)  # parses the bytes directly, no decode step
+    return json.loads(body.decode('utf-8'))
+
+
 def make_request(url, cookies_str):
     """Make HTTP request with cookies"""
-    req = urllib.request.Request(url)
-    req.add_header('Accept', 'application/json')
-    req.add_header('User-Agent', 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36')
-    req.add_header('Cookie', cookies_str)
-
-    with urllib.request.urlopen(req, timeout=30) as response:
-        return json.loads(response.read().decode('utf-8'))
+    return parse_json(http_get(url, cookies_str, accept='application/json'))
 
 
 def fetch_topic_tree(cookies_str, topic_id):
@@ -261,8 +538,11 @@ def fetch_topic_tree(cookies_str, topic_id):
     return make_request(url, cookies_str)
 
 
-def fetch_topic_content(cookies_str, topic_id):
-    """Fetch content for a specific topic"""
+def fetch_topic_content(cookies_str, topic_id, etag=None):
+    """Fetch content for a specific topic; returns (content, etag)
+
+    content is None when etag was given and the topic has not changed.
+    """
     params = urllib.parse.urlencode({
         'key': topic_id,
         'displaytype': 'topic',
@@ -270,7 +550,10 @@ def fetch_topic_content(cookies_str, topic_id):
         'query': 'undefined'
     })
     url = f"{BASE_URL}/api/web/V6/topic?{params}"
-    return make_request(url, cookies_str)
+    response, body = http_request(url, cookies_str, accept='application/json', etag=etag)
+    if response.status == 304:
+        return None, etag
+    return parse_json(body), response.getheader('ETag')
 
 
 def extract_all_topics(tree_data, path=""):
@@ -282,51 +565,100 @@ def extract_all_topics(tree_data, path=""):
     return topics
 
 
+@lru_cache(maxsize=4096)
 def strip_html_tags(text):
     """Remove HTML tags from text, keeping only the text content"""
     if not text:
         return text
-    # Remove HTML tags but keep their text content
-    clean = re.sub(r'<[^>]+>', '', text)
-    # Normalize whitespace
-    clean = re.sub(r'\s+', ' ', clean).strip()
-    return clean
+    # Remove HTML tags but keep their text content, then normalize whitespace
+    # (str.split() splits on the same characters as \s and drops the ends)
+    return ' '.join(_RE_TAGS.sub('', text).split())
 
 
 def extract_topics_from_node(node, path=""):
-    """Extract topics from a tree node"""
+    """Extract topics from a tree node, depth-first in document order"""
     topics = []
-    raw_label = node.get('label', 'Untitled')
-    # Strip HTML tags from label
-    label = strip_html_tags(raw_label)
-    link_target = node.get('linkTarget')
-
-    safe_label = re.sub(r'[^\w\s-]', '', label)[:50].strip()
-    current_path = f"{path}/{safe_label}" if path else safe_label
-
-    # Include all nodes - both with content (linkTarget) and category headers (no linkTarget)
-    topics.append({
-        'id': link_target,  # Will be None for category headers
-        'label': label,
-        'path': current_path,
-        'is_category': link_target is None
-    })
-
-    for child in node.get('children', []):
-        topics.extend(extract_topics_from_node(child, current_path))
+    # Explicit stack instead of recursion; children are pushed in reverse so
+    # they pop off in their original order
+    stack = [(node, path)]
+    while stack:
+        node, path = stack.pop()
+        raw_label = node.get('label', 'Untitled')
+        # Strip HTML tags from label
+        label = strip_html_tags(raw_label)
+        link_target = node.get('linkTarget')
+
+        safe_label = _RE_NONWORD.sub('', label)[:50].strip()
+        current_path = f"{path}/{safe_label}" if path else safe_label
+
+        # Include all nodes - both with content (linkTarget) and category headers (no linkTarget)
+        topics.append({
+            'id': link_target,  # Will be None for category headers
+            'label': label,
+            'path': current_path,
+            'is_category': link_target is None
+        })
+
+        stack.extend((child, current_path) for child in reversed(node.get('children', ())))
 
     return topics
 
 
+@lru_cache(maxsize=4096)
 def sanitize_filename(name):
-    """Create safe filename"""
-    # First strip any HTML tags
-    name = strip_html_tags(name)
-    name = re.sub(r'[^\w\s-]', '', name)
-    name = re.sub(r'\s+', '_', name)
+    """Create safe filename
+
+    name must already be plain text: topic labels are stripped of HTML once,
+    in extract_topics_from_node, and every caller passes topic['label'].
+    """
+    name = _RE_NONWORD.sub('', name)
+    name = _RE_WS.sub('_', name)
     return name[:100]
 
 
+def download_topic(topic, cookies_str, rel_prefix):
+    """Download one topic with its images and save it
+
+    Returns the number of new images, or None if the topic was unchanged.
+    """
+    topic_dir = OUTPUT_DIR / topic['path']
+    md_file = topic_dir / "content.md"
+
+    # Only revalidate when the previous output is still there to fall back on
+    etag = topic_etags.get(topic['id']) if md_file.exists() else None
+    content_data, new_etag = fetch_topic_content(cookies_str, topic['id'], etag)
+    if content_data is None:
+        return None
+
+    body_html = content_data.get('bodyHtml', '')
+    title = content_data.get('title', topic['label'])
+
+    markdown_content, new_imgs, complete = html_to_markdown(body_html, cookies_str, topic['path'], rel_prefix)
+
+    full_markdown = f"# {title}\n\n{markdown_content}"
+
+    topic_dir.mkdir(parents=True, exist_ok=True)
+    md_file.write_text(full_markdown, encoding='utf-8')
+
+    # Raw archive for create_html.py; nobody reads it by hand, so keep it compact
+    json_file = topic_dir / "raw.json"
+    if orjson is not None:
+        json_file.write_bytes(orjson.dumps(content_data))
+    else:
+        json_file.write_text(json.dumps(content_data, ensure_ascii=False, separators=(',', ':')),
+                             encoding='utf-8')
+
+    # Recorded last, so a topic that failed halfway is fetched in full next
+    # time; likewise one that was only saved in degraded form (HTML stripped
+    # of tags, or images left pointing at their remote URL)
+    if new_etag and complete:
+        topic_etags[topic['id']] = new_etag
+    else:
+        topic_etags.pop(topic['id'], None)
+
+    return new_imgs
+
+
 def download_manual(resume_from=0):
     """Main download function"""
     print("Skoda Enyaq Manual Downloader")
@@ -338,6 +670,13 @@ def download_manual(resume_from=0):
     print("Loading cookies...")
     cookies_str = load_cookies()
 
+    known_images = load_image_manifest()
+    if known_images:
+        print(f"Loaded {known_images} known images from {MANIFEST_FILE}")
+    known_etags = load_etags()
+    if known_etags:
+        print(f"Loaded {known_etags} topic ETags from {ETAGS_FILE}")
+
     print(f"Fetching topic tree from root: {ROOT_TOPIC_ID}...")
     tree_data = fetch_topic_tree(cookies_str, ROOT_TOPIC_ID)
 
@@ -353,61 +692,67 @@ def download_manual(resume_from=0):
         print(f"Resuming from topic {resume_from}...")
 
     success_count = 0
+    unchanged_count = 0
     error_count = 0
     image_count = 0
 
-    for i, topic in enumerate(topics):
-        if i < resume_from:
-            continue
-
-        topic_id = topic['id']
-        topic_path = topic['path']
-        topic_label = topic['label']
-        is_category = topic.get('is_category', False)
-
-        print(f"[{i+1}/{len(topics)}] {topic_label[:40]}...", end=' ', flush=True)
-
-        # Skip category headers (no content to download)
-        if is_category or topic_id is None:
-            print("(category)")
-            continue
-
-        try:
-            content_data = fetch_topic_content(cookies_str, topic_id)
-            body_html = content_data.get('bodyHtml', '')
-            title = content_data.get('title', topic_label)
-
-            prev_img_count = len(downloaded_images)
-            markdown_content = html_to_markdown(body_html, cookies_str, topic_path)
-            new_imgs = len(downloaded_images) - prev_img_count
-            image_count += new_imgs
-
-            full_markdown = f"# {title}\n\n{markdown_content}"
-
-            topic_dir = OUTPUT_DIR / topic_path
-            topic_dir.mkdir(parents=True, exist_ok=True)
-
-            md_file = topic_dir / "content.md"
-            md_file.write_text(full_markdown, encoding='utf-8')
-
-            json_file = topic_dir / "raw.json"
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(content_data, f, indent=2, ensure_ascii=False)
-
-            img_info = f" (+{new_imgs} imgs)" if new_imgs > 0 else ""
-            print(f"OK{img_info}")
-            success_count += 1
-
-        except Exception as e:
-            print(f"ERROR: {e}")
-            error_count += 1
-
-        time.sleep(DELAY_BETWEEN_REQUESTS)
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    try:
+        # Submit everything up front; results are reported in topic order
+        futures = {}
+        for i, topic in enumerate(topics):
+            if i < resume_from:
+                continue
+            # Skip category headers (no content to download)
+            if topic.get('is_category', False) or topic['id'] is None:
+                continue
+            rel_prefix = topic_rel_prefix(topic['path'])
+            futures[i] = executor.submit(download_topic, topic, cookies_str, rel_prefix)
+
+        for i, topic in enumerate(topics):
+            if i < resume_from:
+                continue
+
+            print(f"[{i+1}/{len(topics)}] {topic['label'][:40]}...", end=' ', flush=True)
+
+            if i not in futures:
+                print("(category)")
+                continue
+
+            try:
+                new_imgs = futures[i].result()
+                if new_imgs is None:
+                    print("OK (unchanged)")
+                    unchanged_count += 1
+                else:
+                    image_count += new_imgs
+                    img_info = f" (+{new_imgs} imgs)" if new_imgs > 0 else ""
+                    print(f"OK{img_info}")
+                success_count += 1
+
+            except Exception as e:
+                print(f"ERROR: {e}")
+                error_count += 1
+
+            if (success_count + error_count) % MANIFEST_SAVE_EVERY == 0:
+                save_image_manifest()
+                save_etags()
+
+        executor.shutdown()
+    except BaseException:
+        # Ctrl-C or a crash: drop the queued topics instead of running them
+        # all first; --resume picks up from here. The image pool stays up so
+        # topics already in progress can finish cleanly.
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        save_image_manifest()
+        save_etags()
 
     print()
     print("=" * 40)
     print(f"Download complete!")
-    print(f"Topics: {success_count} success, {error_count} errors")
+    print(f"Topics: {success_count} success ({unchanged_count} unchanged), {error_count} errors")
     print(f"Images downloaded: {len(downloaded_images)}")
     print(f"Output: {OUTPUT_DIR.absolute()}")
 
@@ -424,32 +769,33 @@ def create_combined_markdown():
     with open(index_file, 'r', encoding='utf-8') as f:
         topics = json.load(f)
 
-    combined = ["# Škoda Enyaq Handleiding\n\n"]
-    combined.append("## Inhoudsopgave\n\n")
+    # Stream straight to disk; the combined file can be far larger than any topic
+    combined_file = OUTPUT_DIR / "combined_manual.md"
+    with open(combined_file, 'w', encoding='utf-8') as out:
+        out.write("# Škoda Enyaq Handleiding\n\n")
+        out.write("## Inhoudsopgave\n\n")
 
-    for topic in topics:
-        depth = topic['path'].count('/')
-        indent = '  ' * depth
-        anchor = sanitize_filename(topic['label'])
-        combined.append(f"{indent}- [{topic['label']}](#{anchor})\n")
+        for topic in topics:
+            depth = topic['path'].count('/')
+            indent = '  ' * depth
+            anchor = sanitize_filename(topic['label'])
+            out.write(f"{indent}- [{topic['label']}](#{anchor})\n")
 
-    combined.append("\n---\n\n")
+        out.write("\n---\n\n")
 
-    for topic in topics:
-        topic_dir = OUTPUT_DIR / topic['path']
-        md_file = topic_dir / "content.md"
+        for topic in topics:
+            topic_dir = OUTPUT_DIR / topic['path']
+            md_file = topic_dir / "content.md"
 
-        if md_file.exists():
-            content = md_file.read_text(encoding='utf-8')
-            # Fix image paths for combined file (all relative to root)
-            content = re.sub(r'\.\./+images/', 'images/', content)
-            anchor = sanitize_filename(topic['label'])
-            combined.append(f"<a name=\"{anchor}\"></a>\n\n")
-            combined.append(content)
-            combined.append("\n\n---\n\n")
+            if md_file.exists():
+                anchor = sanitize_filename(topic['label'])
+                out.write(f"<a name=\"{anchor}\"></a>\n\n")
+                with open(md_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        # Fix image paths for combined file (all relative to root)
+                        out.write(_RE_REL_IMAGES.sub('images/', line))
+                out.write("\n\n---\n\n")
 
-    combined_file = OUTPUT_DIR / "combined_manual.md"
-    combined_file.write_text(''.join(combined), encoding='utf-8')
     print(f"Saved combined manual to {combined_file}")
 
 